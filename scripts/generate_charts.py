@@ -5,9 +5,15 @@ Generates business-focused charts and insights from scraped data
 """
 
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')  # headless raster backend; we only ever savefig to PNG
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
+import os
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 # Set style for professional business charts
@@ -23,11 +29,109 @@ plt.rcParams['ytick.labelsize'] = 9
 CHARTS_DIR = Path("charts")
 CHARTS_DIR.mkdir(exist_ok=True)
 
+# Only the columns the analyses actually read, with compact explicit dtypes,
+# so read_csv skips the long text fields and avoids object-dtype inference
+MARKET_COLS = ['venue_id', 'rating_score', 'rating_volume', 'delivers',
+               'delivery_price', 'estimate_minutes', 'tags']
+MARKET_DTYPES = {
+    'venue_id': 'string',
+    'rating_score': 'float32',
+    'rating_volume': 'Int32',
+    'delivers': 'bool',
+    'delivery_price': 'float32',
+    'estimate_minutes': 'float32',
+    'tags': 'string[pyarrow]',
+}
+ITEM_COLS = ['venue_id', 'venue_name', 'section_name', 'price',
+             'discount_amount', 'discount_percentage', 'is_available']
+ITEM_DTYPES = {
+    'venue_id': 'string',
+    'venue_name': 'category',
+    'section_name': 'category',
+    'price': 'float32',
+    'discount_amount': 'float32',
+    'discount_percentage': 'float32',
+    'is_available': 'bool',
+}
+
+# Tag patterns used to categorize markets (checked in order, first match wins)
+CATEGORY_PATTERNS = [
+    'grocery|supermarket',
+    'alcohol|beer|piv',
+    'zoo|pet',
+    'aptek|pharm',
+    'flower|gul|cicek',
+    'cake|bakery|dessert',
+    'vape|smoke|tobacco',
+    'baby|toy',
+    'phone|mobile|telekom|aksesuar',
+]
+CATEGORY_LABELS = [
+    'Supermarket',
+    'Alcohol & Beverages',
+    'Pet Supplies',
+    'Pharmacy',
+    'Flowers',
+    'Bakery & Desserts',
+    'Tobacco & Vape',
+    'Baby & Kids',
+    'Electronics & Accessories',
+]
+
+def categorize_markets(markets):
+    """Assign a 'category' column from tag patterns (vectorized, computed once)"""
+    # Lower once, then one C-level contains scan per category instead of a
+    # Python function call per row
+    tags_lower = markets['tags'].fillna('').str.lower()
+    conds = [tags_lower.str.contains(p, regex=True, na=False).values for p in CATEGORY_PATTERNS]
+    # np.select yields an object array of ~10 distinct labels; store it as
+    # category so the items join copies int8 codes, not strings
+    markets['category'] = pd.Categorical(np.select(conds, CATEGORY_LABELS, default='Other'))
+
+# pandas dtype -> pyarrow type for the CSV reader
+_PA_TYPES = {
+    'string': pa.string(),
+    'string[pyarrow]': pa.string(),
+    'category': pa.dictionary(pa.int32(), pa.string()),
+    'bool': pa.bool_(),
+    'float32': pa.float32(),
+    'Int32': pa.int32(),
+}
+
+def _load_cached(csv_path, usecols, dtype):
+    """Load a CSV through a parquet cache (parse once, reload columnar after)"""
+    parquet_path = Path(csv_path).with_suffix('.parquet')
+    if parquet_path.exists():
+        return pd.read_parquet(parquet_path, columns=usecols)
+
+    # Cold path: Arrow's multi-threaded CSV reader tokenizes in parallel and
+    # converts to pandas without an object-dtype detour; astype then pins
+    # the declared pandas dtypes (e.g. nullable Int32, arrow-backed strings)
+    table = pacsv.read_csv(
+        csv_path,
+        read_options=pacsv.ReadOptions(use_threads=True),
+        # item descriptions contain embedded newlines inside quoted cells
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=usecols,
+            column_types={c: _PA_TYPES[dtype[c]] for c in usecols},
+        ),
+    )
+    df = table.to_pandas(split_blocks=True, self_destruct=True).astype(dtype)
+    df.to_parquet(parquet_path, compression='zstd')
+    return df
+
 def load_data():
     """Load the scraped data"""
     print("Loading data...")
-    markets = pd.read_csv("data/markets_baku.csv")
-    items = pd.read_csv("data/items_baku.csv")
+    markets = _load_cached("data/markets_baku.csv", MARKET_COLS, MARKET_DTYPES)
+    items = _load_cached("data/items_baku.csv", ITEM_COLS, ITEM_DTYPES)
+
+    # The repeated-string columns feed value_counts/groupby/merge several
+    # times; make sure they are categorical regardless of which cache path
+    # produced the frames (astype is a no-op if already categorical)
+    items['section_name'] = items['section_name'].astype('category')
+    items['venue_name'] = items['venue_name'].astype('category')
 
     print(f"Loaded {len(markets)} markets and {len(items)} items")
     return markets, items
@@ -36,34 +140,6 @@ def analyze_market_categories(markets):
     """Analyze market types and categories"""
     print("\n1. Analyzing market categories...")
 
-    # Extract tag patterns to categorize markets
-    def categorize_market(tags):
-        if pd.isna(tags):
-            return "Other"
-        tags = str(tags).lower()
-
-        if "grocery" in tags or "supermarket" in tags:
-            return "Supermarket"
-        elif "alcohol" in tags or "beer" in tags or "piv" in tags:
-            return "Alcohol & Beverages"
-        elif "zoo" in tags or "pet" in tags:
-            return "Pet Supplies"
-        elif "aptek" in tags or "pharm" in tags:
-            return "Pharmacy"
-        elif "flower" in tags or "gul" in tags or "cicek" in tags:
-            return "Flowers"
-        elif "cake" in tags or "bakery" in tags or "dessert" in tags:
-            return "Bakery & Desserts"
-        elif "vape" in tags or "smoke" in tags or "tobacco" in tags:
-            return "Tobacco & Vape"
-        elif "baby" in tags or "toy" in tags:
-            return "Baby & Kids"
-        elif "phone" in tags or "mobile" in tags or "telekom" in tags or "aksesuar" in tags:
-            return "Electronics & Accessories"
-        else:
-            return "Other"
-
-    markets['category'] = markets['tags'].apply(categorize_market)
     category_counts = markets['category'].value_counts()
 
     # Chart 1: Market Distribution by Category
@@ -90,23 +166,28 @@ def analyze_pricing_strategy(items):
     """Analyze pricing and discount strategies"""
     print("\n2. Analyzing pricing strategies...")
 
-    # Filter valid prices
-    items_with_price = items[items['price'] > 0].copy()
+    # Work on the raw arrays: a boolean mask plus one fancy index replaces
+    # the filtered-DataFrame copies
+    prices = items['price'].to_numpy()
 
     # Chart 2: Price Distribution
     fig, ax = plt.subplots(figsize=(12, 6))
 
     # Focus on reasonable price range for better visualization
-    price_range = items_with_price[items_with_price['price'] <= 50]['price']
+    price_range = prices[(prices > 0) & (prices <= 50)]
 
-    ax.hist(price_range, bins=50, color='#2E86AB', alpha=0.7, edgecolor='black')
+    # Bin in NumPy and hand matplotlib the counts, instead of letting
+    # ax.hist re-scan the raw values
+    counts, edges = np.histogram(price_range, bins=50)
+    ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge',
+           color='#2E86AB', alpha=0.7, edgecolor='black')
     ax.set_xlabel('Price (AZN)', fontweight='bold')
     ax.set_ylabel('Number of Products', fontweight='bold')
     ax.set_title('Product Price Distribution (0-50 AZN)', fontsize=14, fontweight='bold', pad=20)
     ax.grid(axis='y', alpha=0.3)
 
     # Add median line
-    median_price = price_range.median()
+    median_price = np.median(price_range)
     ax.axvline(median_price, color='red', linestyle='--', linewidth=2, label=f'Median: {median_price:.2f} AZN')
     ax.legend()
 
@@ -115,20 +196,27 @@ def analyze_pricing_strategy(items):
     plt.close()
 
     # Chart 3: Discount Analysis
-    items_with_discount = items[items['discount_percentage'] > 0].copy()
+    discount_pcts = items['discount_percentage'].to_numpy()
+    discount_mask = discount_pcts > 0
+    discount_pcts = discount_pcts[discount_mask]
+    discount_amounts = items['discount_amount'].to_numpy()[discount_mask]
 
-    if len(items_with_discount) > 0:
+    if len(discount_pcts) > 0:
         fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
 
         # Discount distribution
-        ax1.hist(items_with_discount['discount_percentage'], bins=30, color='#E63946', alpha=0.7, edgecolor='black')
+        counts, edges = np.histogram(discount_pcts, bins=30)
+        ax1.bar(edges[:-1], counts, width=np.diff(edges), align='edge',
+                color='#E63946', alpha=0.7, edgecolor='black')
         ax1.set_xlabel('Discount Percentage (%)', fontweight='bold')
         ax1.set_ylabel('Number of Products', fontweight='bold')
         ax1.set_title('Discount Percentage Distribution', fontsize=13, fontweight='bold')
         ax1.grid(axis='y', alpha=0.3)
 
         # Average discount amount
-        ax2.hist(items_with_discount['discount_amount'], bins=30, color='#F4A261', alpha=0.7, edgecolor='black')
+        counts, edges = np.histogram(discount_amounts, bins=30)
+        ax2.bar(edges[:-1], counts, width=np.diff(edges), align='edge',
+                color='#F4A261', alpha=0.7, edgecolor='black')
         ax2.set_xlabel('Discount Amount (AZN)', fontweight='bold')
         ax2.set_ylabel('Number of Products', fontweight='bold')
         ax2.set_title('Discount Amount Distribution', fontsize=13, fontweight='bold')
@@ -138,8 +226,8 @@ def analyze_pricing_strategy(items):
         plt.savefig(CHARTS_DIR / "03_discount_analysis.png", dpi=300, bbox_inches='tight')
         plt.close()
 
-        print(f"   - {len(items_with_discount)} products on discount ({len(items_with_discount)/len(items)*100:.1f}%)")
-        print(f"   - Average discount: {items_with_discount['discount_percentage'].mean():.1f}%")
+        print(f"   - {len(discount_pcts)} products on discount ({len(discount_pcts)/len(items)*100:.1f}%)")
+        print(f"   - Average discount: {discount_pcts.mean():.1f}%")
 
 def analyze_ratings_performance(markets):
     """Analyze market ratings and performance"""
@@ -151,8 +239,12 @@ def analyze_ratings_performance(markets):
         # Chart 4: Rating Distribution
         fig, ax = plt.subplots(figsize=(12, 6))
 
-        rating_counts = markets_with_ratings['rating_score'].value_counts().sort_index()
-        bars = ax.bar(rating_counts.index, rating_counts.values, color='#06A77D', alpha=0.8, edgecolor='black')
+        # Ratings land on a 0.1 grid; bincount on tenths replaces the
+        # float-hashing value_counts + sort
+        ratings_tenths = np.rint(markets_with_ratings['rating_score'].to_numpy() * 10).astype(np.int32)
+        counts = np.bincount(ratings_tenths)
+        scores = np.nonzero(counts)[0]
+        bars = ax.bar(scores / 10, counts[scores], color='#06A77D', alpha=0.8, edgecolor='black')
         ax.set_xlabel('Rating Score', fontweight='bold')
         ax.set_ylabel('Number of Markets', fontweight='bold')
         ax.set_title('Market Rating Score Distribution', fontsize=14, fontweight='bold', pad=20)
@@ -175,19 +267,17 @@ def analyze_ratings_performance(markets):
         # Filter for better visualization
         plot_data = markets_with_ratings[markets_with_ratings['rating_volume'] <= 5000].copy()
 
-        scatter = ax.scatter(plot_data['rating_volume'], plot_data['rating_score'],
-                           alpha=0.5, s=50, c=plot_data['rating_score'],
-                           cmap='RdYlGn', edgecolors='black', linewidth=0.5)
+        # Many markets collide on the same pixel at this figure size; hexbin
+        # draws O(bins) patches instead of one marker per market, and the
+        # bin density shows the overlap the scatter hid
+        ax.hexbin(plot_data['rating_volume'].to_numpy(), plot_data['rating_score'].to_numpy(),
+                  gridsize=50, cmap='RdYlGn', mincnt=1, edgecolors='none')
 
         ax.set_xlabel('Number of Reviews', fontweight='bold')
         ax.set_ylabel('Rating Score', fontweight='bold')
         ax.set_title('Market Maturity: Rating vs Review Volume', fontsize=14, fontweight='bold', pad=20)
         ax.grid(alpha=0.3)
 
-        # Add colorbar
-        cbar = plt.colorbar(scatter, ax=ax)
-        cbar.set_label('Rating Score', fontweight='bold')
-
         plt.tight_layout()
         plt.savefig(CHARTS_DIR / "05_rating_vs_reviews.png", dpi=300, bbox_inches='tight')
         plt.close()
@@ -201,8 +291,13 @@ def analyze_delivery_coverage(markets):
     # Chart 6: Delivery Fee Distribution
     fig, ax = plt.subplots(figsize=(12, 6))
 
-    delivery_fee_counts = delivering_markets['delivery_price'].value_counts().sort_index()
-    bars = ax.bar(delivery_fee_counts.index, delivery_fee_counts.values,
+    # Fees are whole cents, estimates whole minutes: bincount on the scaled
+    # integers gives the sorted counts in one C pass
+    fees = delivering_markets['delivery_price'].to_numpy()
+    fee_cents = np.rint(fees[~np.isnan(fees)] * 100).astype(np.int64)
+    counts = np.bincount(fee_cents)
+    cents = np.nonzero(counts)[0]
+    bars = ax.bar(cents / 100, counts[cents],
                    color='#4361EE', alpha=0.8, edgecolor='black')
     ax.set_xlabel('Delivery Fee (AZN)', fontweight='bold')
     ax.set_ylabel('Number of Markets', fontweight='bold')
@@ -224,8 +319,11 @@ def analyze_delivery_coverage(markets):
     # Chart 7: Delivery Time Estimates
     fig, ax = plt.subplots(figsize=(12, 6))
 
-    estimate_counts = delivering_markets['estimate_minutes'].value_counts().sort_index()
-    bars = ax.bar(estimate_counts.index, estimate_counts.values,
+    estimates = delivering_markets['estimate_minutes'].to_numpy()
+    minutes_int = np.rint(estimates[~np.isnan(estimates)]).astype(np.int64)
+    counts = np.bincount(minutes_int)
+    minutes = np.nonzero(counts)[0]
+    bars = ax.bar(minutes, counts[minutes],
                    color='#F72585', alpha=0.8, edgecolor='black')
     ax.set_xlabel('Estimated Delivery Time (Minutes)', fontweight='bold')
     ax.set_ylabel('Number of Markets', fontweight='bold')
@@ -265,8 +363,9 @@ def analyze_market_concentration(items, markets):
     """Analyze market share and concentration"""
     print("\n6. Analyzing market concentration...")
 
-    # Products per venue
-    products_per_venue = items.groupby('venue_name').size().sort_values(ascending=False).head(20)
+    # Products per venue - value_counts on the categorical counts integer
+    # codes directly, no GroupBy machinery or separate sort pass
+    products_per_venue = items['venue_name'].value_counts().head(20)
 
     # Chart 9: Top Markets by Product Volume
     fig, ax = plt.subplots(figsize=(12, 8))
@@ -292,8 +391,9 @@ def analyze_availability_stock(items):
     """Analyze product availability and stock patterns"""
     print("\n7. Analyzing product availability...")
 
-    # Availability statistics
-    available_count = items['is_available'].sum()
+    # Availability statistics - count the bool buffer directly, no int64
+    # promotion
+    available_count = int(np.count_nonzero(items['is_available'].to_numpy()))
     unavailable_count = len(items) - available_count
 
     # Chart 10: Product Availability Status
@@ -323,37 +423,40 @@ def analyze_availability_stock(items):
     plt.savefig(CHARTS_DIR / "10_product_availability.png", dpi=300, bbox_inches='tight')
     plt.close()
 
-def analyze_price_by_category(items, markets):
+def analyze_price_by_category(items):
     """Analyze pricing patterns across different market categories"""
     print("\n8. Analyzing price patterns by market category...")
 
-    # Merge items with market categories
-    def categorize_market(tags):
-        if pd.isna(tags):
-            return "Other"
-        tags = str(tags).lower()
-
-        if "grocery" in tags or "supermarket" in tags:
-            return "Supermarket"
-        elif "alcohol" in tags or "beer" in tags:
-            return "Alcohol & Beverages"
-        elif "zoo" in tags or "pet" in tags:
-            return "Pet Supplies"
-        elif "aptek" in tags or "pharm" in tags:
-            return "Pharmacy"
-        elif "flower" in tags or "gul" in tags:
-            return "Flowers"
-        elif "cake" in tags or "bakery" in tags or "dessert" in tags:
-            return "Bakery & Desserts"
-        else:
-            return "Other"
-
-    markets['category'] = markets['tags'].apply(categorize_market)
-    items_with_category = items.merge(markets[['venue_id', 'category']], on='venue_id', how='left')
-
-    # Calculate average price by category
-    items_valid = items_with_category[(items_with_category['price'] > 0) & (items_with_category['price'] <= 100)].copy()
-    avg_price_by_category = items_valid.groupby('category')['price'].agg(['mean', 'median', 'count']).sort_values('mean', ascending=False)
+    # Calculate average price by category (items already carry the market
+    # category from the join done once in main); build one mask on the raw
+    # price array and slice the frame a single time
+    price = items['price'].to_numpy()
+    items_valid = items.loc[(price > 0) & (price <= 100)]
+
+    # Aggregate mean/median/count per category in one sorted pass over the
+    # price array instead of three hash-keyed groupby traversals; the
+    # category column is already categorical, so its integer codes come
+    # for free instead of re-hashing the label strings via factorize
+    codes = items_valid['category'].cat.codes.to_numpy()
+    categories = items_valid['category'].cat.categories
+    prices = items_valid['price'].to_numpy()
+    order = np.argsort(codes, kind='stable')
+    codes_sorted = codes[order]
+    prices_sorted = prices[order]
+    # missing categories code as -1; stable sort puts them first, so the
+    # searchsorted boundaries skip them, like groupby's dropna
+    starts = np.searchsorted(codes_sorted, np.arange(len(categories)))
+    counts = np.diff(np.append(starts, len(codes_sorted)))
+    # unlike factorize, the dtype lists every category even if the mask
+    # filtered one out entirely; aggregate only the non-empty ones
+    present = counts > 0
+    means = np.full(len(categories), np.nan)
+    means[present] = np.add.reduceat(prices_sorted, starts[present]) / counts[present]
+    medians = np.array([np.median(prices_sorted[s:s + c]) if c else np.nan
+                        for s, c in zip(starts, counts)])
+    avg_price_by_category = pd.DataFrame(
+        {'mean': means, 'median': medians, 'count': counts},
+        index=categories).sort_values('mean', ascending=False)
 
     # Filter categories with sufficient data
     avg_price_by_category = avg_price_by_category[avg_price_by_category['count'] >= 50]
@@ -385,21 +488,37 @@ def generate_summary_statistics(markets, items):
     """Generate key business metrics"""
     print("\n9. Generating summary statistics...")
 
+    # Compute each mask once and aggregate on the masked arrays directly,
+    # instead of rebuilding a filtered DataFrame per statistic
+    prices = items['price'].values
+    prices = prices[prices > 0]
+    discounts = items['discount_percentage'].values
+    discounts = discounts[discounts > 0]
+    fees = markets['delivery_price'].values
+    fees = fees[fees > 0]
+    ratings = markets['rating_score'].values
+    ratings = ratings[~np.isnan(ratings)]
+    delivering_count = int(np.count_nonzero(markets['delivers'].to_numpy()))
+    available_count = int(np.count_nonzero(items['is_available'].to_numpy()))
+
     stats = {
         'total_markets': len(markets),
         'total_products': len(items),
         'avg_products_per_market': len(items) / len(markets),
-        'markets_with_delivery': markets['delivers'].sum(),
-        'delivery_penetration': (markets['delivers'].sum() / len(markets)) * 100,
-        'avg_delivery_fee': markets[markets['delivery_price'] > 0]['delivery_price'].mean(),
-        'markets_with_ratings': markets[markets['rating_score'].notna()].shape[0],
-        'avg_rating': markets[markets['rating_score'].notna()]['rating_score'].mean(),
-        'products_on_discount': items[items['discount_percentage'] > 0].shape[0],
-        'discount_penetration': (items[items['discount_percentage'] > 0].shape[0] / len(items)) * 100,
-        'avg_discount_percentage': items[items['discount_percentage'] > 0]['discount_percentage'].mean(),
-        'median_price': items[items['price'] > 0]['price'].median(),
-        'avg_price': items[items['price'] > 0]['price'].mean(),
-        'product_availability_rate': (items['is_available'].sum() / len(items)) * 100,
+        'markets_with_delivery': delivering_count,
+        'delivery_penetration': (delivering_count / len(markets)) * 100,
+        # Masks can come up empty (e.g. every delivery fee is 0 in the
+        # committed data); mean() on an empty array warns, so fall back
+        # to NaN the way the old filtered-frame mean did silently
+        'avg_delivery_fee': fees.mean() if fees.size else float('nan'),
+        'markets_with_ratings': len(ratings),
+        'avg_rating': ratings.mean() if ratings.size else float('nan'),
+        'products_on_discount': len(discounts),
+        'discount_penetration': (len(discounts) / len(items)) * 100,
+        'avg_discount_percentage': discounts.mean() if discounts.size else float('nan'),
+        'median_price': np.median(prices) if prices.size else float('nan'),
+        'avg_price': prices.mean() if prices.size else float('nan'),
+        'product_availability_rate': (available_count / len(items)) * 100,
     }
 
     # Chart 12: Key Business Metrics Dashboard
@@ -453,16 +572,28 @@ def main():
     # Load data
     markets, items = load_data()
 
-    # Run all analyses
-    analyze_market_categories(markets)
-    analyze_pricing_strategy(items)
-    analyze_ratings_performance(markets)
-    analyze_delivery_coverage(markets)
-    analyze_product_categories(items)
-    analyze_market_concentration(items, markets)
-    analyze_availability_stock(items)
-    analyze_price_by_category(items, markets)
-    stats = generate_summary_statistics(markets, items)
+    # Categorize markets once; every analysis reads markets['category'],
+    # and items get their market's category through a single join
+    categorize_markets(markets)
+    items = items.merge(markets[['venue_id', 'category']], on='venue_id', how='left')
+
+    # Run all analyses in parallel - each one reads its own columns and
+    # writes its own PNGs, so they fan out cleanly across cores
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = [
+            executor.submit(analyze_market_categories, markets),
+            executor.submit(analyze_pricing_strategy, items),
+            executor.submit(analyze_ratings_performance, markets),
+            executor.submit(analyze_delivery_coverage, markets),
+            executor.submit(analyze_product_categories, items),
+            executor.submit(analyze_market_concentration, items, markets),
+            executor.submit(analyze_availability_stock, items),
+            executor.submit(analyze_price_by_category, items),
+        ]
+        stats_future = executor.submit(generate_summary_statistics, markets, items)
+        for future in futures:
+            future.result()
+        stats = stats_future.result()
 
     print("\n" + "="*60)
     print("ANALYSIS COMPLETE!")
@@ -4,13 +4,21 @@ Wolt Markets Scraper
 Scrapes all supermarkets, items, prices, and related data from Wolt API
 """
 
-import requests
+import httpx
+import uvloop
+import asyncio
 import json
+import msgspec
+import orjson
 import csv
 import time
 import os
-from typing import Dict, List, Optional
-from datetime import datetime
+import ssl
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone
 import logging
 
 # Setup logging
@@ -20,6 +28,209 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Fixed CSV schemas so rows can stream to disk as they are scraped
+MARKET_FIELDS = (
+    'venue_id', 'name', 'slug', 'address', 'city', 'city_slug', 'country',
+    'latitude', 'longitude', 'rating_score', 'rating_volume', 'price_range',
+    'online', 'delivers', 'delivery_price', 'estimate_minutes',
+    'estimate_range', 'short_description', 'tags', 'scraped_at',
+)
+ITEM_FIELDS = (
+    'item_id', 'venue_id', 'venue_name', 'venue_slug', 'city', 'city_slug',
+    'section_name', 'section_slug', 'name', 'description', 'price',
+    'original_price', 'discount_amount', 'discount_percentage', 'unit_info',
+    'unit_price_value', 'unit_price_base', 'unit_price_unit', 'barcode_gtin',
+    'image_url', 'image_blurhash', 'purchasable_balance', 'quantity_left',
+    'max_quantity_per_purchase', 'min_quantity_per_purchase',
+    'alcohol_permille', 'caffeine_info', 'vat_percentage',
+    'dietary_preferences', 'tags', 'is_available', 'is_wolt_plus_only',
+    'is_cutlery', 'deposit', 'scraped_at',
+)
+
+
+class UnitPrice(msgspec.Struct):
+    """unit_price sub-object on a venue item"""
+    price: float = 0
+    # base renders straight into the CSV, so keep the API's int form
+    base: Optional[int] = None
+    unit: str = ''
+
+
+class ItemImage(msgspec.Struct):
+    # The API sends explicit null for absent blurhashes
+    url: str = ''
+    blurhash: Optional[str] = None
+
+
+class VenueItem(msgspec.Struct):
+    """The subset of a venue-content item the scraper exports
+
+    Scalars the API sends as explicit null are typed Optional - msgspec
+    defaults only cover missing keys, not null values.
+    """
+    id: str = ''
+    name: str = ''
+    description: str = ''
+    price: float = 0
+    original_price: Optional[float] = None
+    unit_info: Optional[str] = None
+    unit_price: Optional[UnitPrice] = None
+    barcode_gtin: Optional[str] = None
+    images: List[ItemImage] = []
+    purchasable_balance: Any = None
+    quantity_left: Any = None
+    max_quantity_per_purchase: Any = None
+    min_quantity_per_purchase: Any = None
+    alcohol_permille: int = 0
+    caffeine_info: Optional[str] = None
+    vat_percentage: int = 0
+    dietary_preferences: List[Any] = []
+    tags: List[Any] = []
+    disabled_info: Any = None
+    is_wolt_plus_only: bool = False
+    is_cutlery: bool = False
+    deposit: Any = None
+
+
+class VenueSection(msgspec.Struct):
+    name: str = ''
+    slug: str = ''
+    items: List[VenueItem] = []
+
+
+class VenueContent(msgspec.Struct):
+    """Typed schema for the venue-content endpoint
+
+    msgspec decodes the response bytes straight into these structs -
+    unknown fields are skipped, and attribute access in the extraction
+    loop is a C-level slot load instead of a dict lookup.
+    """
+    sections: List[VenueSection] = []
+
+
+class AsyncRateLimiter:
+    """Token-bucket rate limiter shared by all in-flight requests"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def _join_tokens(values: List[Any]) -> str:
+    """Comma-join tag/preference lists from the API.
+
+    The API usually returns homogeneous lists, so an all-strings list
+    joins directly without per-element isinstance checks; mixed lists
+    fall back to pulling the 'id' out of dict entries.
+    """
+    if not values:
+        return ''
+    if isinstance(values[0], str):
+        try:
+            return ','.join(values)
+        except TypeError:
+            pass  # mixed list despite a string head
+    return ','.join(v if v.__class__ is str else v.get('id', '') if isinstance(v, dict) else str(v) for v in values)
+
+
+def extract_venue_rows(venue_data: Optional[VenueContent], venue_info: Dict,
+                       scraped_at: str) -> List[tuple]:
+    """Extract all item rows, as tuples in ITEM_FIELDS order (pure, picklable)"""
+    if not venue_data:
+        return []
+
+    items = []
+
+    # Get sections - items are directly in each section
+    venue_sections = venue_data.sections
+    if not venue_sections:
+        return []
+
+    # Venue-level fields constant across every row, bound once
+    venue_id = venue_info.get('id', '')
+    venue_name = venue_info.get('name', '')
+    venue_slug = venue_info.get('slug', '')
+    city = venue_info.get('city_name', '')
+    city_slug = venue_info.get('city_slug', '')
+
+    for section in venue_sections:
+
+        for item_data in section.items:
+            # Struct attribute access is a C-level slot load; bind the
+            # values the discount math reads more than once
+            price = item_data.price
+            original_price = item_data.original_price
+            unit_price = item_data.unit_price
+            images = item_data.images
+            first_image = images[0] if images else None
+
+            # Positional row in ITEM_FIELDS order - a flat tuple per
+            # item is far cheaper than a dict for csv.writer
+            items.append((
+                item_data.id,
+                venue_id,
+                venue_name,
+                venue_slug,
+                city,
+                city_slug,
+                section.name,
+                section.slug,
+                item_data.name,
+                item_data.description,
+                price / 100,  # Convert to decimal
+                original_price / 100 if original_price else None,
+                (original_price - price) / 100 if original_price else 0,
+                round(((original_price - price) / original_price) * 100, 2) if original_price and original_price > 0 else 0,
+                item_data.unit_info or '',
+                unit_price.price / 100 if unit_price else None,
+                unit_price.base if unit_price else None,
+                unit_price.unit if unit_price else '',
+                item_data.barcode_gtin or '',
+                first_image.url if first_image else '',
+                first_image.blurhash or '' if first_image else '',
+                item_data.purchasable_balance,
+                item_data.quantity_left,
+                item_data.max_quantity_per_purchase,
+                item_data.min_quantity_per_purchase,
+                item_data.alcohol_permille,
+                item_data.caffeine_info or '',
+                item_data.vat_percentage,
+                _join_tokens(item_data.dietary_preferences),
+                _join_tokens(item_data.tags),
+                not item_data.disabled_info,
+                item_data.is_wolt_plus_only,
+                item_data.is_cutlery,
+                item_data.deposit,
+                scraped_at,
+            ))
+
+    logger.info(f"Extracted {len(items)} items from {venue_info.get('name', 'unknown venue')}")
+    return items
+
+
+def _decode_and_extract(raw: bytes, venue_info: Dict, scraped_at: str) -> List[tuple]:
+    """Process-pool worker: decode raw venue bytes and extract item rows"""
+    try:
+        venue_data = msgspec.json.decode(raw, type=VenueContent)
+    except msgspec.DecodeError as e:
+        logger.error(f"Failed to decode venue {venue_info.get('slug', '')}: {e}")
+        return []
+    return extract_venue_rows(venue_data, venue_info, scraped_at)
+
 
 class WoltMarketsScraper:
     """Scraper for Wolt Markets data"""
@@ -27,61 +238,116 @@ class WoltMarketsScraper:
     BASE_URL = "https://restaurant-api.wolt.com"
     CONSUMER_API_URL = "https://consumer-api.wolt.com"
 
+    # Prebound URL templates - formatting a venue URL is a single
+    # str.format call instead of rebuilding the path per request
+    VENUE_URL_TMPL = (CONSUMER_API_URL
+                      + "/consumer-api/venue-content-api/v3/web/venue-content/slug/{}").format
+    RETAIL_URL_TMPL = (CONSUMER_API_URL + "/v1/pages/retail?lat={}&lon={}").format
+
     # Default coordinates (Baku, Azerbaijan as example)
     DEFAULT_LAT = 40.373141313556964
     DEFAULT_LON = 49.84575754727883
 
+    # Concurrency / rate limits for the async HTTP fan-out
+    MAX_CONCURRENCY = 16
+    REQUESTS_PER_SECOND = 2
+
+    # How long cached venue-content responses stay valid on disk
+    VENUE_CACHE_TTL = 6 * 3600  # seconds
+
+    HEADERS = {
+        'accept': 'application/json, text/plain, */*',
+        'accept-language': 'en-GB,en-US;q=0.9,en;q=0.8,ru;q=0.7,az;q=0.6',
+        'app-language': 'az',
+        'client-version': '1.16.76',
+        'clientversionnumber': '1.16.76',
+        'platform': 'Web',
+        'origin': 'https://wolt.com',
+        'referer': 'https://wolt.com/',
+        'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36',
+    }
+
     def __init__(self, output_dir: str = "data"):
         self.output_dir = output_dir
-        self.session = requests.Session()
-        self.session.headers.update({
-            'accept': 'application/json, text/plain, */*',
-            'accept-language': 'en-GB,en-US;q=0.9,en;q=0.8,ru;q=0.7,az;q=0.6',
-            'app-language': 'az',
-            'client-version': '1.16.76',
-            'clientversionnumber': '1.16.76',
-            'platform': 'Web',
-            'origin': 'https://wolt.com',
-            'referer': 'https://wolt.com/',
-            'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36',
-        })
+
+        # One SSLContext shared by every connection - building it is the
+        # expensive part of TLS setup, so pay for it once up front
+        self._ssl_ctx = ssl.create_default_context()
+
+        # Created in run() once the event loop exists
+        self.session: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._limiter: Optional[AsyncRateLimiter] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
 
         # Ensure output directory exists
         os.makedirs(output_dir, exist_ok=True)
 
+        # On-disk memo of venue-content responses, keyed by slug; reruns
+        # within the TTL skip the network entirely
+        self._venue_cache_dir = os.path.join(output_dir, 'cache', 'venues')
+        os.makedirs(self._venue_cache_dir, exist_ok=True)
+
+        # Stream rows to disk as venues are processed instead of buffering
+        # the whole crawl in memory; partial progress survives crashes
+        self._markets_file = open(os.path.join(output_dir, 'markets.csv'),
+                                  'w', newline='', encoding='utf-8')
+        self._markets_writer = csv.writer(self._markets_file)
+        self._markets_writer.writerow(MARKET_FIELDS)
+        self._items_file = open(os.path.join(output_dir, 'items.csv'),
+                                'w', newline='', encoding='utf-8')
+        self._items_writer = csv.writer(self._items_file)
+        self._items_writer.writerow(ITEM_FIELDS)
+
         # Data storage
         self.cities = []
-        self.markets = []
-        self.items = []
-        self.categories = []
+        # One timestamp for the whole scrape, stamped when run() starts;
+        # second precision is plenty and skips per-row datetime formatting
+        self.scraped_at = ''
+        self._visited_slugs: set = set()
+        self.market_count = 0
+        self.item_count = 0
+
+    async def make_request(self, url: str, method: str = "GET", schema=None,
+                           raw: bool = False, **kwargs):
+        """Make HTTP request with error handling and rate limiting
+
+        When a msgspec schema is given, the body decodes straight into
+        typed structs; with raw=True the undecoded bytes come back so
+        decoding can happen off the event loop; otherwise it parses into
+        plain dicts via orjson.
+        """
+        if method.upper() not in ("GET", "POST"):
+            raise ValueError(f"Unsupported method: {method}")
 
-    def make_request(self, url: str, method: str = "GET", **kwargs) -> Optional[Dict]:
-        """Make HTTP request with error handling and rate limiting"""
         try:
-            time.sleep(0.5)  # Rate limiting
-
-            if method.upper() == "GET":
-                response = self.session.get(url, **kwargs)
-            elif method.upper() == "POST":
-                response = self.session.post(url, **kwargs)
-            else:
-                raise ValueError(f"Unsupported method: {method}")
-
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            # Bound in-flight requests; the token bucket enforces the global
+            # request rate without serializing the whole scrape
+            async with self._semaphore:
+                await self._limiter.acquire()
+                response = await self.session.request(method.upper(), url, **kwargs)
+                response.raise_for_status()
+                body = response.content
+
+            if raw:
+                return body
+            if schema is not None:
+                return msgspec.json.decode(body, type=schema)
+            # orjson parses the raw bytes directly, skipping the text decode
+            return orjson.loads(body)
+        except httpx.HTTPError as e:
             logger.error(f"Request failed for {url}: {e}")
             return None
-        except json.JSONDecodeError as e:
+        except (msgspec.DecodeError, orjson.JSONDecodeError, json.JSONDecodeError) as e:
             logger.error(f"Failed to parse JSON from {url}: {e}")
             return None
 
-    def fetch_cities(self) -> List[Dict]:
+    async def fetch_cities(self) -> List[Dict]:
         """Fetch all available cities"""
         logger.info("Fetching cities...")
         url = f"{self.BASE_URL}/v1/cities"
 
-        data = self.make_request(url)
+        data = await self.make_request(url)
         if data and 'results' in data:
             self.cities = data['results']
             logger.info(f"Found {len(self.cities)} cities")
@@ -90,12 +356,12 @@ class WoltMarketsScraper:
         logger.warning("No cities found")
         return []
 
-    def fetch_retail_markets(self, lat: float, lon: float, city_slug: str = "") -> List[Dict]:
+    async def fetch_retail_markets(self, lat: float, lon: float, city_slug: str = "") -> List[Dict]:
         """Fetch retail markets for a specific location"""
         logger.info(f"Fetching retail markets for location: {lat}, {lon}")
-        url = f"{self.CONSUMER_API_URL}/v1/pages/retail?lat={lat}&lon={lon}"
+        url = self.RETAIL_URL_TMPL(lat, lon)
 
-        data = self.make_request(url)
+        data = await self.make_request(url)
         if not data:
             return []
 
@@ -114,83 +380,62 @@ class WoltMarketsScraper:
         logger.info(f"Found {len(markets)} markets")
         return markets
 
-    def fetch_venue_details(self, venue_slug: str) -> Optional[Dict]:
-        """Fetch detailed information about a specific venue including all items"""
-        logger.info(f"Fetching details for venue: {venue_slug}")
-        url = f"{self.CONSUMER_API_URL}/consumer-api/venue-content-api/v3/web/venue-content/slug/{venue_slug}"
-
-        return self.make_request(url)
+    async def fetch_venue_details(self, venue_slug: str, raw: bool = False):
+        """Fetch detailed information about a specific venue including all items
 
-    def extract_items_from_venue(self, venue_data: Dict, venue_info: Dict) -> List[Dict]:
-        """Extract all items from venue data"""
-        if not venue_data:
-            return []
-
-        items = []
-
-        # Get sections - items are directly in each section
-        venue_sections = venue_data.get('sections', [])
-        if not venue_sections:
-            return []
+        With raw=True the response bytes are returned undecoded, so the
+        decode + extraction can run on the process pool. Responses are
+        memoized on disk by slug; reruns within the TTL read the cached
+        bytes instead of hitting the network.
+        """
+        # Chains can appear under several cities; fetch each slug once
+        if venue_slug in self._visited_slugs:
+            return None
+        self._visited_slugs.add(venue_slug)
 
-        for section in venue_sections:
-            section_name = section.get('name', '')
-            section_slug = section.get('slug', '')
-
-            # Items are directly in the section
-            section_items = section.get('items', [])
-
-            for item_data in section_items:
-                # Extract comprehensive item information
-                item = {
-                    'item_id': item_data.get('id', ''),
-                    'venue_id': venue_info.get('id', ''),
-                    'venue_name': venue_info.get('name', ''),
-                    'venue_slug': venue_info.get('slug', ''),
-                    'city': venue_info.get('city_name', ''),
-                    'city_slug': venue_info.get('city_slug', ''),
-                    'section_name': section_name,
-                    'section_slug': section_slug,
-                    'name': item_data.get('name', ''),
-                    'description': item_data.get('description', ''),
-                    'price': item_data.get('price', 0) / 100,  # Convert to decimal
-                    'original_price': item_data.get('original_price', 0) / 100 if item_data.get('original_price') else None,
-                    'discount_amount': (item_data.get('original_price', 0) - item_data.get('price', 0)) / 100 if item_data.get('original_price') else 0,
-                    'discount_percentage': round(((item_data.get('original_price', 0) - item_data.get('price', 0)) / item_data.get('original_price', 1)) * 100, 2) if item_data.get('original_price') and item_data.get('original_price') > 0 else 0,
-                    'unit_info': item_data.get('unit_info', ''),
-                    'unit_price_value': item_data.get('unit_price', {}).get('price', 0) / 100 if item_data.get('unit_price') else None,
-                    'unit_price_base': item_data.get('unit_price', {}).get('base', 0) if item_data.get('unit_price') else None,
-                    'unit_price_unit': item_data.get('unit_price', {}).get('unit', '') if item_data.get('unit_price') else '',
-                    'barcode_gtin': item_data.get('barcode_gtin', ''),
-                    'image_url': item_data.get('images', [{}])[0].get('url', '') if item_data.get('images') else '',
-                    'image_blurhash': item_data.get('images', [{}])[0].get('blurhash', '') if item_data.get('images') else '',
-                    'purchasable_balance': item_data.get('purchasable_balance', None),
-                    'quantity_left': item_data.get('quantity_left', None),
-                    'max_quantity_per_purchase': item_data.get('max_quantity_per_purchase', None),
-                    'min_quantity_per_purchase': item_data.get('min_quantity_per_purchase', None),
-                    'alcohol_permille': item_data.get('alcohol_permille', 0),
-                    'caffeine_info': item_data.get('caffeine_info', ''),
-                    'vat_percentage': item_data.get('vat_percentage', 0),
-                    'dietary_preferences': ','.join([pref if isinstance(pref, str) else pref.get('id', '') for pref in item_data.get('dietary_preferences', [])]),
-                    'tags': ','.join([tag.get('id', '') if isinstance(tag, dict) else str(tag) for tag in item_data.get('tags', [])]),
-                    'is_available': not item_data.get('disabled_info'),
-                    'is_wolt_plus_only': item_data.get('is_wolt_plus_only', False),
-                    'is_cutlery': item_data.get('is_cutlery', False),
-                    'deposit': item_data.get('deposit', None),
-                    'scraped_at': datetime.now().isoformat(),
-                }
+        body = self._cached_venue_body(venue_slug)
+        if body is None:
+            logger.info(f"Fetching details for venue: {venue_slug}")
+            body = await self.make_request(self.VENUE_URL_TMPL(venue_slug), raw=True)
+            if body:
+                self._store_venue_body(venue_slug, body)
 
-                items.append(item)
+        if not body:
+            return None
+        if raw:
+            return body
+        try:
+            return msgspec.json.decode(body, type=VenueContent)
+        except msgspec.DecodeError as e:
+            logger.error(f"Failed to parse venue content for {venue_slug}: {e}")
+            return None
 
-        logger.info(f"Extracted {len(items)} items from {venue_info.get('name', 'unknown venue')}")
-        return items
+    def _cached_venue_body(self, venue_slug: str) -> Optional[bytes]:
+        """Return cached venue-content bytes for the slug, or None if stale/missing"""
+        path = os.path.join(self._venue_cache_dir, f'{venue_slug}.json')
+        try:
+            if time.time() - os.path.getmtime(path) < self.VENUE_CACHE_TTL:
+                with open(path, 'rb') as f:
+                    return f.read()
+        except OSError:
+            pass
+        return None
+
+    def _store_venue_body(self, venue_slug: str, body: bytes):
+        path = os.path.join(self._venue_cache_dir, f'{venue_slug}.json')
+        try:
+            with open(path, 'wb') as f:
+                f.write(body)
+        except OSError as e:
+            logger.warning(f"Could not cache venue {venue_slug}: {e}")
 
-    def scrape_all_markets(self):
+    async def scrape_all_markets(self):
         """Main scraping function"""
         logger.info("Starting Wolt Markets scraping...")
+        self.scraped_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
 
         # Fetch all cities
-        cities = self.fetch_cities()
+        cities = await self.fetch_cities()
 
         if not cities:
             logger.warning("No cities found. Using default location.")
@@ -212,68 +457,83 @@ class WoltMarketsScraper:
             logger.info(f"Processing city: {city_name} ({city_slug})")
 
             # Fetch retail markets for this city
-            markets = self.fetch_retail_markets(lat, lon, city_slug)
+            markets = await self.fetch_retail_markets(lat, lon, city_slug)
 
-            # Process each market
+            # Every row in this run carries the same scrape timestamp
+            scraped_at = self.scraped_at
             for market in markets:
-                market_slug = market.get('slug', '')
                 market_name = market.get('name', '')
 
-                # Add market to our collection
-                self.markets.append({
-                    'venue_id': market.get('id', ''),
-                    'name': market_name,
-                    'slug': market_slug,
-                    'address': market.get('address', ''),
-                    'city': city_name,
-                    'city_slug': city_slug,
-                    'country': market.get('country', ''),
-                    'latitude': market.get('location', [0, 0])[1],
-                    'longitude': market.get('location', [0, 0])[0],
-                    'rating_score': market.get('rating', {}).get('score', None),
-                    'rating_volume': market.get('rating', {}).get('volume', None),
-                    'price_range': market.get('price_range', None),
-                    'online': market.get('online', False),
-                    'delivers': market.get('delivers', False),
-                    'delivery_price': market.get('delivery_price_int', 0) / 100,
-                    'estimate_minutes': market.get('estimate', 0),
-                    'estimate_range': market.get('estimate_range', ''),
-                    'short_description': market.get('short_description', ''),
-                    'tags': ','.join(market.get('tags', [])),
-                    'scraped_at': datetime.now().isoformat(),
-                })
-
-                # Fetch detailed venue information including items
-                venue_details = self.fetch_venue_details(market_slug)
-
-                if venue_details:
-                    # Extract all items from this venue
-                    venue_items = self.extract_items_from_venue(venue_details, market)
-                    self.items.extend(venue_items)
-
-        logger.info(f"Scraping completed. Total markets: {len(self.markets)}, Total items: {len(self.items)}")
+                # Stream the market row (MARKET_FIELDS order) straight to the CSV
+                self.market_count += 1
+                location = market.get('location', [0, 0])
+                rating = market.get('rating', {})
+                self._markets_writer.writerow((
+                    market.get('id', ''),
+                    market_name,
+                    market.get('slug', ''),
+                    market.get('address', ''),
+                    city_name,
+                    city_slug,
+                    market.get('country', ''),
+                    location[1],
+                    location[0],
+                    rating.get('score', None),
+                    rating.get('volume', None),
+                    market.get('price_range', None),
+                    market.get('online', False),
+                    market.get('delivers', False),
+                    market.get('delivery_price_int', 0) / 100,
+                    market.get('estimate', 0),
+                    market.get('estimate_range', ''),
+                    market.get('short_description', ''),
+                    ','.join(market.get('tags', [])),
+                    scraped_at,
+                ))
+
+            # Fetch all venue details for this city concurrently; the
+            # semaphore and rate limiter in make_request keep the fan-out
+            # within the configured limits
+            details = await asyncio.gather(
+                *(self.fetch_venue_details(market.get('slug', ''), raw=True) for market in markets)
+            )
+
+            # Decode and extract on the process pool so JSON post-processing
+            # uses every core while the event loop keeps downloading
+            loop = asyncio.get_running_loop()
+            extractions = await asyncio.gather(*(
+                loop.run_in_executor(self._executor, _decode_and_extract, raw, market, scraped_at)
+                for market, raw in zip(markets, details) if raw
+            ))
+            for rows in extractions:
+                if rows:
+                    self._items_writer.writerows(rows)
+                    self.item_count += len(rows)
+
+        logger.info(f"Scraping completed. Total markets: {self.market_count}, Total items: {self.item_count}")
+
+    def save_to_parquet(self):
+        """Convert the streamed CSVs to zstd-compressed parquet
+
+        The analysis pipeline loads parquet directly, so emitting it here
+        means the charts never have to re-parse the CSVs.
+        """
+        for name in ('markets.csv', 'items.csv'):
+            csv_path = os.path.join(self.output_dir, name)
+            table = pacsv.read_csv(
+                csv_path,
+                # descriptions contain embedded newlines inside quoted cells
+                parse_options=pacsv.ParseOptions(newlines_in_values=True))
+            parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+            pq.write_table(table, parquet_path, compression='zstd')
+            logger.info(f"Saved parquet copy to {parquet_path}")
 
     def save_to_csv(self):
-        """Save scraped data to CSV files"""
-        logger.info("Saving data to CSV files...")
-
-        # Save markets
-        if self.markets:
-            markets_file = os.path.join(self.output_dir, 'markets.csv')
-            with open(markets_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=self.markets[0].keys())
-                writer.writeheader()
-                writer.writerows(self.markets)
-            logger.info(f"Saved {len(self.markets)} markets to {markets_file}")
-
-        # Save items
-        if self.items:
-            items_file = os.path.join(self.output_dir, 'items.csv')
-            with open(items_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=self.items[0].keys())
-                writer.writeheader()
-                writer.writerows(self.items)
-            logger.info(f"Saved {len(self.items)} items to {items_file}")
+        """Finalize the streamed CSV files and write the scrape summary"""
+        self._markets_file.close()
+        self._items_file.close()
+        self.save_to_parquet()
+        logger.info(f"Saved {self.market_count} markets and {self.item_count} items")
 
         # Save summary
         summary_file = os.path.join(self.output_dir, 'scrape_summary.txt')
@@ -282,18 +542,29 @@ class WoltMarketsScraper:
             f.write(f"{'='*50}\n")
             f.write(f"Scraped at: {datetime.now().isoformat()}\n")
             f.write(f"Total cities processed: {len(self.cities)}\n")
-            f.write(f"Total markets scraped: {len(self.markets)}\n")
-            f.write(f"Total items scraped: {len(self.items)}\n")
+            f.write(f"Total markets scraped: {self.market_count}\n")
+            f.write(f"Total items scraped: {self.item_count}\n")
             f.write(f"\nData saved to:\n")
             f.write(f"  - {os.path.join(self.output_dir, 'markets.csv')}\n")
             f.write(f"  - {os.path.join(self.output_dir, 'items.csv')}\n")
 
         logger.info(f"Summary saved to {summary_file}")
 
-    def run(self):
+    async def run(self):
         """Run the complete scraping process"""
         try:
-            self.scrape_all_markets()
+            # HTTP/2 multiplexes many in-flight venue requests over a few
+            # connections instead of one response at a time per socket
+            limits = httpx.Limits(max_connections=20, max_keepalive_connections=20)
+            async with httpx.AsyncClient(http2=True, limits=limits,
+                                         headers=self.HEADERS,
+                                         verify=self._ssl_ctx) as client:
+                self.session = client
+                self._semaphore = asyncio.Semaphore(self.MAX_CONCURRENCY)
+                self._limiter = AsyncRateLimiter(rate=self.REQUESTS_PER_SECOND, burst=4)
+                with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+                    self._executor = executor
+                    await self.scrape_all_markets()
             self.save_to_csv()
             logger.info("Scraping process completed successfully!")
         except Exception as e:
@@ -303,8 +574,11 @@ class WoltMarketsScraper:
 
 def main():
     """Main entry point"""
+    # libuv-backed event loop; noticeably faster scheduling for many
+    # small concurrent HTTPS requests than the default selector loop
+    uvloop.install()
     scraper = WoltMarketsScraper(output_dir="data")
-    scraper.run()
+    asyncio.run(scraper.run())
 
 
 if __name__ == "__main__":
@@ -6,11 +6,17 @@ Scrapes supermarkets, items, prices from Wolt API for Baku
 
 import requests
 import json
+import msgspec
+import orjson
 import csv
 import time
 import os
-from typing import Dict, List, Optional
-from datetime import datetime
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
 
 # Setup logging
@@ -20,6 +26,122 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Fixed CSV schemas so rows can stream to disk as they are scraped
+MARKET_FIELDS = (
+    'venue_id', 'name', 'slug', 'address', 'city', 'city_slug', 'country',
+    'latitude', 'longitude', 'rating_score', 'rating_volume', 'price_range',
+    'online', 'delivers', 'delivery_price', 'estimate_minutes',
+    'estimate_range', 'short_description', 'tags', 'scraped_at',
+)
+ITEM_FIELDS = (
+    'item_id', 'venue_id', 'venue_name', 'venue_slug', 'city', 'city_slug',
+    'section_name', 'section_slug', 'name', 'description', 'price',
+    'original_price', 'discount_amount', 'discount_percentage', 'unit_info',
+    'unit_price_value', 'unit_price_base', 'unit_price_unit', 'barcode_gtin',
+    'image_url', 'image_blurhash', 'purchasable_balance', 'quantity_left',
+    'max_quantity_per_purchase', 'min_quantity_per_purchase',
+    'alcohol_permille', 'caffeine_info', 'vat_percentage',
+    'dietary_preferences', 'tags', 'is_available', 'is_wolt_plus_only',
+    'is_cutlery', 'deposit', 'scraped_at',
+)
+
+
+class UnitPrice(msgspec.Struct):
+    """unit_price sub-object on a venue item"""
+    price: float = 0
+    # base renders straight into the CSV, so keep the API's int form
+    base: Optional[int] = None
+    unit: str = ''
+
+
+class ItemImage(msgspec.Struct):
+    # The API sends explicit null for absent blurhashes
+    url: str = ''
+    blurhash: Optional[str] = None
+
+
+class VenueItem(msgspec.Struct):
+    """The subset of a venue-content item the scraper exports
+
+    Scalars the API sends as explicit null are typed Optional - msgspec
+    defaults only cover missing keys, not null values.
+    """
+    id: str = ''
+    name: str = ''
+    description: str = ''
+    price: float = 0
+    original_price: Optional[float] = None
+    unit_info: Optional[str] = None
+    unit_price: Optional[UnitPrice] = None
+    barcode_gtin: Optional[str] = None
+    images: List[ItemImage] = []
+    purchasable_balance: Any = None
+    quantity_left: Any = None
+    max_quantity_per_purchase: Any = None
+    min_quantity_per_purchase: Any = None
+    alcohol_permille: int = 0
+    caffeine_info: Optional[str] = None
+    vat_percentage: int = 0
+    dietary_preferences: List[Any] = []
+    tags: List[Any] = []
+    disabled_info: Any = None
+    is_wolt_plus_only: bool = False
+    is_cutlery: bool = False
+    deposit: Any = None
+
+
+class VenueSection(msgspec.Struct):
+    name: str = ''
+    slug: str = ''
+    items: List[VenueItem] = []
+
+
+class VenueContent(msgspec.Struct):
+    """Typed schema for the venue-content endpoint
+
+    msgspec decodes the response bytes straight into these structs -
+    unknown fields are skipped, and attribute access in the extraction
+    loop is a C-level slot load instead of a dict lookup.
+    """
+    sections: List[VenueSection] = []
+
+
+def _join_tokens(values: List[Any]) -> str:
+    """Comma-join tag/preference lists from the API.
+
+    The API usually returns homogeneous lists, so an all-strings list
+    joins directly without per-element isinstance checks; mixed lists
+    fall back to pulling the 'id' out of dict entries.
+    """
+    if not values:
+        return ''
+    if isinstance(values[0], str):
+        try:
+            return ','.join(values)
+        except TypeError:
+            pass  # mixed list despite a string head
+    return ','.join(v if v.__class__ is str else v.get('id', '') if isinstance(v, dict) else str(v) for v in values)
+
+
+class TokenBucket:
+    """Token-bucket rate limiter - bursts within budget run at full speed"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+
+    def acquire(self):
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            time.sleep((1 - self._tokens) / self.rate)
+
 
 class WoltMarketsScraper:
     """Scraper for Wolt Markets data"""
@@ -31,13 +153,16 @@ class WoltMarketsScraper:
     DEFAULT_LAT = 40.373141313556964
     DEFAULT_LON = 49.84575754727883
 
+    # How long cached venue-content responses stay valid on disk
+    VENUE_CACHE_TTL = 6 * 3600  # seconds
+
     def __init__(self, output_dir: str = "data", target_city: str = "baku"):
         self.output_dir = output_dir
         self.target_city = target_city
         self.session = requests.Session()
         self.session.headers.update({
             'accept': 'application/json, text/plain, */*',
-            'accept-encoding': 'gzip, deflate',  # Exclude br (brotli) to avoid decompression issues
+            'accept-encoding': 'gzip, deflate, br',  # requests decompresses brotli via the brotli package
             'accept-language': 'en-GB,en-US;q=0.9,en;q=0.8,ru;q=0.7,az;q=0.6',
             'app-language': 'az',
             'client-version': '1.16.76',
@@ -48,17 +173,53 @@ class WoltMarketsScraper:
             'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36',
         })
 
+        # Keep-alive pool sized for reuse, with exponential backoff on the
+        # retryable statuses instead of failing outright
+        adapter = HTTPAdapter(
+            pool_connections=20, pool_maxsize=20,
+            max_retries=Retry(total=3, backoff_factor=0.5,
+                              status_forcelist=[429, 500, 502, 503, 504]))
+        self.session.mount('https://', adapter)
+
+        # Rate limiting: allow short bursts at keep-alive speed while
+        # keeping the average request rate where the old fixed sleep had it
+        self._bucket = TokenBucket(rate=2, burst=4)
+
         # Ensure output directory exists
         os.makedirs(output_dir, exist_ok=True)
 
-        # Data storage
-        self.markets = []
-        self.items = []
+        # On-disk memo of venue-content responses, keyed by slug; reruns
+        # within the TTL skip the network entirely
+        self._venue_cache_dir = os.path.join(output_dir, 'cache', 'venues')
+        os.makedirs(self._venue_cache_dir, exist_ok=True)
+
+        # Stream rows to disk as venues are processed instead of buffering
+        # the whole crawl in memory; partial progress survives crashes
+        self._markets_file = open(os.path.join(output_dir, f'markets_{target_city}.csv'),
+                                  'w', newline='', encoding='utf-8')
+        self._markets_writer = csv.writer(self._markets_file)
+        self._markets_writer.writerow(MARKET_FIELDS)
+        self._items_file = open(os.path.join(output_dir, f'items_{target_city}.csv'),
+                                'w', newline='', encoding='utf-8')
+        self._items_writer = csv.writer(self._items_file)
+        self._items_writer.writerow(ITEM_FIELDS)
 
-    def make_request(self, url: str, method: str = "GET", **kwargs) -> Optional[Dict]:
-        """Make HTTP request with error handling and rate limiting"""
+        # Data storage
+        self.market_count = 0
+        self.item_count = 0
+        # One timestamp for the whole scrape, stamped when scraping starts
+        self.scraped_at = ''
+
+    def make_request(self, url: str, method: str = "GET", schema=None,
+                     raw: bool = False, **kwargs):
+        """Make HTTP request with error handling and rate limiting
+
+        When a msgspec schema is given, the body decodes straight into
+        typed structs; with raw=True the undecoded bytes come back;
+        otherwise it parses into plain dicts via orjson.
+        """
         try:
-            time.sleep(0.5)  # Rate limiting
+            self._bucket.acquire()  # Rate limiting
 
             if method.upper() == "GET":
                 response = self.session.get(url, **kwargs)
@@ -68,11 +229,16 @@ class WoltMarketsScraper:
                 raise ValueError(f"Unsupported method: {method}")
 
             response.raise_for_status()
-            return response.json()
+            if raw:
+                return response.content
+            if schema is not None:
+                return msgspec.json.decode(response.content, type=schema)
+            # orjson parses the raw bytes directly, skipping requests' text decode
+            return orjson.loads(response.content)
         except requests.exceptions.RequestException as e:
             logger.error(f"Request failed for {url}: {e}")
             return None
-        except json.JSONDecodeError as e:
+        except (msgspec.DecodeError, orjson.JSONDecodeError, json.JSONDecodeError) as e:
             logger.error(f"Failed to parse JSON from {url}: {e}")
             return None
 
@@ -100,90 +266,133 @@ class WoltMarketsScraper:
         logger.info(f"Found {len(markets)} markets")
         return markets
 
-    def fetch_venue_details(self, venue_slug: str) -> Optional[Dict]:
-        """Fetch detailed information about a specific venue including all items"""
-        logger.info(f"Fetching details for venue: {venue_slug}")
-        url = f"{self.CONSUMER_API_URL}/consumer-api/venue-content-api/v3/web/venue-content/slug/{venue_slug}"
-
-        data = self.make_request(url)
-        if data:
-            # Debug logging
-            has_items = 'items' in data and len(data.get('items', [])) > 0
-            has_sections = 'sections' in data and len(data.get('sections', [])) > 0
-            logger.debug(f"Venue {venue_slug}: has_items={has_items}, has_sections={has_sections}")
-            if has_items:
-                logger.debug(f"Venue {venue_slug}: {len(data.get('items', []))} items found")
-
+    def fetch_venue_details(self, venue_slug: str) -> Optional[VenueContent]:
+        """Fetch detailed information about a specific venue including all items
+
+        Responses are memoized on disk by slug, so reruns within the TTL
+        decode the cached bytes instead of re-fetching.
+        """
+        body = self._cached_venue_body(venue_slug)
+        if body is None:
+            logger.info(f"Fetching details for venue: {venue_slug}")
+            url = f"{self.CONSUMER_API_URL}/consumer-api/venue-content-api/v3/web/venue-content/slug/{venue_slug}"
+            body = self.make_request(url, raw=True)
+            if body:
+                self._store_venue_body(venue_slug, body)
+
+        if not body:
+            return None
+        try:
+            data = msgspec.json.decode(body, type=VenueContent)
+        except msgspec.DecodeError as e:
+            logger.error(f"Failed to parse venue content for {venue_slug}: {e}")
+            return None
+        # Debug logging
+        logger.debug(f"Venue {venue_slug}: {len(data.sections)} sections found")
         return data
 
-    def extract_items_from_venue(self, venue_data: Dict, venue_info: Dict) -> List[Dict]:
-        """Extract all items from venue data"""
+    def _cached_venue_body(self, venue_slug: str) -> Optional[bytes]:
+        """Return cached venue-content bytes for the slug, or None if stale/missing"""
+        path = os.path.join(self._venue_cache_dir, f'{venue_slug}.json')
+        try:
+            if time.time() - os.path.getmtime(path) < self.VENUE_CACHE_TTL:
+                with open(path, 'rb') as f:
+                    return f.read()
+        except OSError:
+            pass
+        return None
+
+    def _store_venue_body(self, venue_slug: str, body: bytes):
+        path = os.path.join(self._venue_cache_dir, f'{venue_slug}.json')
+        try:
+            with open(path, 'wb') as f:
+                f.write(body)
+        except OSError as e:
+            logger.warning(f"Could not cache venue {venue_slug}: {e}")
+
+    def extract_items_from_venue(self, venue_data: Optional[VenueContent], venue_info: Dict) -> int:
+        """Extract all items from venue data and stream them to the CSV"""
         if not venue_data:
-            return []
+            return 0
 
         items = []
+        # Every row in this run carries the same scrape timestamp
+        scraped_at = self.scraped_at
 
         # Get sections - items are directly in each section
-        venue_sections = venue_data.get('sections', [])
+        venue_sections = venue_data.sections
         if not venue_sections:
             logger.warning(f"No sections found in venue data for {venue_info.get('name', 'unknown')}")
-            return []
+            return 0
+
+        # Venue-level fields constant across every row, bound once
+        venue_id = venue_info.get('id', '')
+        venue_name = venue_info.get('name', '')
+        venue_slug = venue_info.get('slug', '')
+        city = venue_info.get('city_name', '')
+        city_slug = venue_info.get('city_slug', '')
 
         for section in venue_sections:
-            section_name = section.get('name', '')
-            section_slug = section.get('slug', '')
-
-            # Items are directly in the section
-            section_items = section.get('items', [])
-
-            for item_data in section_items:
-                # Extract comprehensive item information
-                item = {
-                    'item_id': item_data.get('id', ''),
-                    'venue_id': venue_info.get('id', ''),
-                    'venue_name': venue_info.get('name', ''),
-                    'venue_slug': venue_info.get('slug', ''),
-                    'city': venue_info.get('city_name', ''),
-                    'city_slug': venue_info.get('city_slug', ''),
-                    'section_name': section_name,
-                    'section_slug': section_slug,
-                    'name': item_data.get('name', ''),
-                    'description': item_data.get('description', ''),
-                    'price': item_data.get('price', 0) / 100,  # Convert to decimal
-                    'original_price': item_data.get('original_price', 0) / 100 if item_data.get('original_price') else None,
-                    'discount_amount': (item_data.get('original_price', 0) - item_data.get('price', 0)) / 100 if item_data.get('original_price') else 0,
-                    'discount_percentage': round(((item_data.get('original_price', 0) - item_data.get('price', 0)) / item_data.get('original_price', 1)) * 100, 2) if item_data.get('original_price') and item_data.get('original_price') > 0 else 0,
-                    'unit_info': item_data.get('unit_info', ''),
-                    'unit_price_value': item_data.get('unit_price', {}).get('price', 0) / 100 if item_data.get('unit_price') else None,
-                    'unit_price_base': item_data.get('unit_price', {}).get('base', 0) if item_data.get('unit_price') else None,
-                    'unit_price_unit': item_data.get('unit_price', {}).get('unit', '') if item_data.get('unit_price') else '',
-                    'barcode_gtin': item_data.get('barcode_gtin', ''),
-                    'image_url': item_data.get('images', [{}])[0].get('url', '') if item_data.get('images') else '',
-                    'image_blurhash': item_data.get('images', [{}])[0].get('blurhash', '') if item_data.get('images') else '',
-                    'purchasable_balance': item_data.get('purchasable_balance', None),
-                    'quantity_left': item_data.get('quantity_left', None),
-                    'max_quantity_per_purchase': item_data.get('max_quantity_per_purchase', None),
-                    'min_quantity_per_purchase': item_data.get('min_quantity_per_purchase', None),
-                    'alcohol_permille': item_data.get('alcohol_permille', 0),
-                    'caffeine_info': item_data.get('caffeine_info', ''),
-                    'vat_percentage': item_data.get('vat_percentage', 0),
-                    'dietary_preferences': ','.join([pref if isinstance(pref, str) else pref.get('id', '') for pref in item_data.get('dietary_preferences', [])]),
-                    'tags': ','.join([tag.get('id', '') if isinstance(tag, dict) else str(tag) for tag in item_data.get('tags', [])]),
-                    'is_available': not item_data.get('disabled_info'),
-                    'is_wolt_plus_only': item_data.get('is_wolt_plus_only', False),
-                    'is_cutlery': item_data.get('is_cutlery', False),
-                    'deposit': item_data.get('deposit', None),
-                    'scraped_at': datetime.now().isoformat(),
-                }
-
-                items.append(item)
+
+            for item_data in section.items:
+                # Struct attribute access is a C-level slot load; bind the
+                # values the discount math reads more than once
+                price = item_data.price
+                original_price = item_data.original_price
+                unit_price = item_data.unit_price
+                images = item_data.images
+                first_image = images[0] if images else None
+
+                # Positional row in ITEM_FIELDS order - a flat tuple per
+                # item is far cheaper than a dict for csv.writer
+                items.append((
+                    item_data.id,
+                    venue_id,
+                    venue_name,
+                    venue_slug,
+                    city,
+                    city_slug,
+                    section.name,
+                    section.slug,
+                    item_data.name,
+                    item_data.description,
+                    price / 100,  # Convert to decimal
+                    original_price / 100 if original_price else None,
+                    (original_price - price) / 100 if original_price else 0,
+                    round(((original_price - price) / original_price) * 100, 2) if original_price and original_price > 0 else 0,
+                    item_data.unit_info or '',
+                    unit_price.price / 100 if unit_price else None,
+                    unit_price.base if unit_price else None,
+                    unit_price.unit if unit_price else '',
+                    item_data.barcode_gtin or '',
+                    first_image.url if first_image else '',
+                    first_image.blurhash or '' if first_image else '',
+                    item_data.purchasable_balance,
+                    item_data.quantity_left,
+                    item_data.max_quantity_per_purchase,
+                    item_data.min_quantity_per_purchase,
+                    item_data.alcohol_permille,
+                    item_data.caffeine_info or '',
+                    item_data.vat_percentage,
+                    _join_tokens(item_data.dietary_preferences),
+                    _join_tokens(item_data.tags),
+                    not item_data.disabled_info,
+                    item_data.is_wolt_plus_only,
+                    item_data.is_cutlery,
+                    item_data.deposit,
+                    scraped_at,
+                ))
+
+        self._items_writer.writerows(items)
+        self.item_count += len(items)
 
         logger.info(f"Extracted {len(items)} items from {venue_info.get('name', 'unknown venue')}")
-        return items
+        return len(items)
 
     def scrape_markets(self):
         """Main scraping function for target city"""
         logger.info(f"Starting Wolt Markets scraping for {self.target_city}...")
+        self.scraped_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
 
         # Use default Baku coordinates
         lat = self.DEFAULT_LAT
@@ -200,67 +409,71 @@ class WoltMarketsScraper:
             logger.error("No markets found for the target city")
             return
 
-        # Process each market
+        # Every row in this run carries the same scrape timestamp
+        scraped_at = self.scraped_at
         for market in markets:
             market_slug = market.get('slug', '')
             market_name = market.get('name', '')
 
-            # Add market to our collection
-            market_data = {
-                'venue_id': market.get('id', ''),
-                'name': market_name,
-                'slug': market_slug,
-                'address': market.get('address', ''),
-                'city': city_name,
-                'city_slug': city_slug,
-                'country': market.get('country', ''),
-                'latitude': market.get('location', [0, 0])[1],
-                'longitude': market.get('location', [0, 0])[0],
-                'rating_score': market.get('rating', {}).get('score', None),
-                'rating_volume': market.get('rating', {}).get('volume', None),
-                'price_range': market.get('price_range', None),
-                'online': market.get('online', False),
-                'delivers': market.get('delivers', False),
-                'delivery_price': market.get('delivery_price_int', 0) / 100,
-                'estimate_minutes': market.get('estimate', 0),
-                'estimate_range': market.get('estimate_range', ''),
-                'short_description': market.get('short_description', ''),
-                'tags': ','.join(market.get('tags', [])),
-                'scraped_at': datetime.now().isoformat(),
-            }
-            self.markets.append(market_data)
+            # Stream the market row (MARKET_FIELDS order) straight to the CSV
+            location = market.get('location', [0, 0])
+            rating = market.get('rating', {})
+            self._markets_writer.writerow((
+                market.get('id', ''),
+                market_name,
+                market_slug,
+                market.get('address', ''),
+                city_name,
+                city_slug,
+                market.get('country', ''),
+                location[1],
+                location[0],
+                rating.get('score', None),
+                rating.get('volume', None),
+                market.get('price_range', None),
+                market.get('online', False),
+                market.get('delivers', False),
+                market.get('delivery_price_int', 0) / 100,
+                market.get('estimate', 0),
+                market.get('estimate_range', ''),
+                market.get('short_description', ''),
+                ','.join(market.get('tags', [])),
+                scraped_at,
+            ))
+            self.market_count += 1
 
             # Fetch detailed venue information including items
             venue_details = self.fetch_venue_details(market_slug)
 
             if venue_details:
                 # Extract all items from this venue
-                venue_items = self.extract_items_from_venue(venue_details, market)
-                self.items.extend(venue_items)
-
-        logger.info(f"Scraping completed. Total markets: {len(self.markets)}, Total items: {len(self.items)}")
+                self.extract_items_from_venue(venue_details, market)
+
+        logger.info(f"Scraping completed. Total markets: {self.market_count}, Total items: {self.item_count}")
+
+    def save_to_parquet(self):
+        """Convert the streamed CSVs to zstd-compressed parquet
+
+        The analysis pipeline loads parquet directly, so emitting it here
+        means the charts never have to re-parse the CSVs.
+        """
+        for name in (f'markets_{self.target_city}.csv', f'items_{self.target_city}.csv'):
+            csv_path = os.path.join(self.output_dir, name)
+            table = pacsv.read_csv(
+                csv_path,
+                # descriptions contain embedded newlines inside quoted cells
+                parse_options=pacsv.ParseOptions(newlines_in_values=True))
+            parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+            pq.write_table(table, parquet_path, compression='zstd')
+            logger.info(f"Saved parquet copy to {parquet_path}")
 
     def save_to_csv(self):
-        """Save scraped data to CSV files"""
-        logger.info("Saving data to CSV files...")
-
-        # Save markets
-        if self.markets:
-            markets_file = os.path.join(self.output_dir, f'markets_{self.target_city}.csv')
-            with open(markets_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=self.markets[0].keys())
-                writer.writeheader()
-                writer.writerows(self.markets)
-            logger.info(f"Saved {len(self.markets)} markets to {markets_file}")
-
-        # Save items
-        if self.items:
-            items_file = os.path.join(self.output_dir, f'items_{self.target_city}.csv')
-            with open(items_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=self.items[0].keys())
-                writer.writeheader()
-                writer.writerows(self.items)
-            logger.info(f"Saved {len(self.items)} items to {items_file}")
+        """Finalize the streamed CSV files and write the scrape summary"""
+        self._markets_file.close()
+        self._items_file.close()
+        self.save_to_parquet()
+        if self.item_count:
+            logger.info(f"Saved {self.market_count} markets and {self.item_count} items")
         else:
             logger.warning("No items found to save")
 
@@ -271,8 +484,8 @@ class WoltMarketsScraper:
             f.write(f"{'='*50}\n")
             f.write(f"Scraped at: {datetime.now().isoformat()}\n")
             f.write(f"Target city: {self.target_city}\n")
-            f.write(f"Total markets scraped: {len(self.markets)}\n")
-            f.write(f"Total items scraped: {len(self.items)}\n")
+            f.write(f"Total markets scraped: {self.market_count}\n")
+            f.write(f"Total items scraped: {self.item_count}\n")
             f.write(f"\nData saved to:\n")
             f.write(f"  - {os.path.join(self.output_dir, f'markets_{self.target_city}.csv')}\n")
             f.write(f"  - {os.path.join(self.output_dir, f'items_{self.target_city}.csv')}\n")